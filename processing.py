@@ -1,17 +1,58 @@
 import sys
 import re
-import ast
+import json
+import argparse
+import importlib
 import pandas as pd
 
-from processing_scripts import category as categories_mod
-from processing_scripts import dietary_labels as dietary_mod
-from processing_scripts import difficulty as difficulty_mod
-from processing_scripts import data_cleaning as data_cleaning_mod
-from processing_scripts import cuisine_type as cuisine_type_mod
-from processing_scripts import usda_integration as usda_mod   # <-- NEW IMPORT
+from processing_scripts import csv_loader as loader_mod
+
+# Stage modules are imported inside the functions that use them, so a run
+# only loads what its selected stages need (usda_integration pulls in requests).
+
+DERIVED_COLS = ["top_level_cuisine", "course", "cuisine_type"]
+
+# Pipeline stages in run order, and the processing_scripts modules each one needs
+STAGES = ["time", "course", "cuisine", "dietary", "difficulty", "usda"]
+STAGE_MODULES = {
+    "time": ["data_cleaning"],
+    "course": ["category"],
+    "cuisine": ["cuisine_type"],
+    "dietary": ["dietary_labels"],
+    "difficulty": ["difficulty"],
+    "usda": ["usda_integration"],
+}
+
+# Columns each stage writes. Re-running a stage on an earlier output
+# replaces them in place.
+STAGE_COLUMNS = {
+    "course": ["top_level_cuisine", "course"],
+    "cuisine": ["cuisine_type"],
+    "dietary": ["dietary_restrictions"],
+    "difficulty": ["difficulty_score", "difficulty"],
+    "usda": ["total_calories_usda"],
+}
+
+# category.cuisine_bucket -> course column value
+COURSE_FOR_BUCKET = {"Appetizers": "appetizer", "Main Dish": "main", "Dessert": "dessert"}
+
+# USDA lookup limits (--max-rows / --max-ingredients)
+USDA_MAX_ROWS = 2000
+USDA_MAX_INGREDIENTS = 3
+
+
+def import_stage_modules(stages=STAGES) -> dict:
+    """Imports the modules the given stages need (the worker uses this to preload them)."""
+    mods = {}
+    for stage in stages:
+        for name in STAGE_MODULES[stage]:
+            mods[name] = importlib.import_module(f"processing_scripts.{name}")
+    return mods
 
 
 def add_course_from_cuisine_path(df: pd.DataFrame, path_col: str = "cuisine_path") -> pd.DataFrame:
+    from processing_scripts import category as categories_mod
+
     col = path_col if path_col in df.columns else next((c for c in df.columns if "cuisine" in c.lower()), None)
 
     def top_level(x: str):
@@ -24,120 +65,411 @@ def add_course_from_cuisine_path(df: pd.DataFrame, path_col: str = "cuisine_path
     df = df.copy()
     df["top_level_cuisine"] = df[col].astype(str).apply(top_level) if col else None
 
-    uniques = sorted(set([t for t in df["top_level_cuisine"].dropna().tolist()]))
-    buckets = categories_mod.categorize_cuisines(uniques)
-
-    rev = {}
-    for bucket, items in buckets.items():
-        for it in items:
-            rev[it] = bucket
-
     def to_course(tlc):
-        b = rev.get(tlc, "Main Dish")
-        return {"Appetizers": "appetizer", "Main Dish": "main", "Dessert": "dessert"}.get(b, "main")
+        # cuisine_bucket is memoized, so known cuisines are not re-classified
+        b = categories_mod.cuisine_bucket(tlc) if isinstance(tlc, str) else "Main Dish"
+        return COURSE_FOR_BUCKET.get(b, "main")
 
     df["course"] = df["top_level_cuisine"].apply(to_course)
     return df
 
 
-def add_dietary_flags(df: pd.DataFrame, in_csv_path: str) -> pd.DataFrame:
-    flags = dietary_mod.categorize_dietary_labels(in_csv_path)
+def add_dietary_flags(df: pd.DataFrame) -> pd.DataFrame:
+    from processing_scripts import dietary_labels as dietary_mod
+
+    # Labels are inferred from the source columns only, not from columns added earlier in the pipeline
+    source = df.drop(columns=[c for c in DERIVED_COLS if c in df.columns])
+    flags = dietary_mod.dietary_labels_for_df(source)
     flags = flags.reset_index(drop=True)
     df = df.reset_index(drop=True)
     return pd.concat([df, flags], axis=1)
 
 
-def add_difficulty_simple(df: pd.DataFrame) -> pd.DataFrame:
+def add_difficulty_simple(df: pd.DataFrame, thresholds=None) -> pd.DataFrame:
     """
     score = total_time * number_of_directions
-    buckets: <200 easy, <600 medium, else hard
+    buckets: <200 easy, <600 medium, else hard (0 -> N/A)
+    thresholds: (low, high) cut points, or "quantile" for terciles of this run's scores
     """
-    time_col = next((c for c in df.columns if c.lower() in ["total_time", "total time"]), None)
-    dir_col = next((c for c in df.columns if any(k in c.lower() for k in ["direction", "instruction", "step"])), None)
+    from processing_scripts import difficulty as difficulty_mod
 
-    def count_steps(val):
-        if val is None:
-            return 0
-        s = str(val).strip()
-        try:
-            maybe = ast.literal_eval(s)
-            if isinstance(maybe, list):
-                return sum(1 for x in maybe if str(x).strip())
-        except Exception:
-            pass
-        parts = [x.strip() for x in s.split("\n") if x.strip()]
-        if len(parts) <= 1:
-            parts = [x.strip() for x in s.split(".") if x.strip()]
-        return len(parts)
-
-    def to_minutes(x):
-        try:
-            return max(float(x), 0.0)
-        except Exception:
-            return 0.0
+    if thresholds is None:
+        thresholds = difficulty_mod.DEFAULT_THRESHOLDS
 
-    steps = df[dir_col].apply(count_steps) if dir_col else 0
-    mins = df[time_col].apply(to_minutes) if time_col else 0.0
-    score = (mins * steps).round(2) if isinstance(steps, pd.Series) else 0.0
+    time_col = next((c for c in df.columns if c.lower() in ["total_time", "total time"]), None)
+    dir_col = next((c for c in df.columns if any(k in c.lower() for k in ["direction", "instruction", "step"])), None)
 
     df = df.copy()
-    df["difficulty_score"] = score
+    if dir_col is None:
+        df["difficulty_score"] = 0.0
+        df["difficulty"] = "N/A"
+        return df
 
-    def bucket(s):
-        if s == 0:
-            return "N/A"
-        elif s < 200:
-            return "easy"
-        elif s < 600:
-            return "medium"
-        return "hard"
+    times = df[time_col] if time_col else pd.Series(0.0, index=df.index)
+    df["difficulty_score"] = difficulty_mod.difficulty_scores(times, df[dir_col])
 
     if time_col is None:
         df["difficulty"] = "N/A"
-    else:
-        df["difficulty"] = df["difficulty_score"].apply(bucket) if isinstance(score, pd.Series) else "N/A"
+        return df
+
+    if thresholds == "quantile":
+        thresholds = difficulty_mod.quantile_thresholds(df["difficulty_score"])
+        print(f"Difficulty thresholds (quantile): {thresholds[0]:.2f} / {thresholds[1]:.2f}")
+    df["difficulty"] = difficulty_mod.bucket_scores(df["difficulty_score"], thresholds, zero_as_na=True)
     return df
 
 
-def main():
-    if len(sys.argv) != 3:
-        print("Usage: python build_cleaned_dataset.py <input.csv> <output.csv>")
-        sys.exit(1)
+def _stage_list(spec: str) -> list:
+    names = [x.strip() for x in spec.split(",") if x.strip()]
+    unknown = [n for n in names if n not in STAGES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown stage(s) {', '.join(unknown)} (choose from {', '.join(STAGES)})")
+    return names
 
-    in_csv, out_csv = sys.argv[1], sys.argv[2]
 
-    temp_df = pd.read_csv(in_csv, nrows=1)
+def _max_rows(value: str):
+    return None if value == "all" else int(value)
 
-    prep_col = "prep_time" if "prep_time" in temp_df.columns else ("Prep Time" if "Prep Time" in temp_df.columns else None)
-    cook_col = "cook_time" if "cook_time" in temp_df.columns else ("Cook Time" if "Cook Time" in temp_df.columns else None)
-    total_col = "total_time" if "total_time" in temp_df.columns else ("Total Time" if "Total Time" in temp_df.columns else None)
 
-    df = data_cleaning_mod.standardize_time_columns_df(
-        in_csv,
-        prep_col=prep_col,
-        cook_col=cook_col,
-        total_col=total_col
+def _add_usda_options(parser):
+    parser.add_argument("--usda-cache", default=None, help="USDA cache file (default: usda_cache.json)")
+    parser.add_argument(
+        "--max-rows",
+        type=_max_rows,
+        default=USDA_MAX_ROWS,
+        help=f"rows that get USDA calories, counted from the start of the full file "
+             f"(default {USDA_MAX_ROWS}, 'all' for no limit)",
+    )
+    parser.add_argument(
+        "--max-ingredients",
+        type=int,
+        default=USDA_MAX_INGREDIENTS,
+        help=f"ingredients looked up per recipe (default {USDA_MAX_INGREDIENTS})",
     )
+    parser.add_argument(
+        "--usda-workers",
+        type=int,
+        default=4,
+        help="background threads for USDA lookups, overlapped with the other stages (0 = sequential)",
+    )
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="processing.py run", description="Build the cleaned recipe dataset.")
+    parser.add_argument("in_csv")
+    parser.add_argument("out_csv")
+    parser.add_argument(
+        "--stages",
+        type=_stage_list,
+        default=list(STAGES),
+        help=f"comma-separated stages to run (default: all of {','.join(STAGES)})",
+    )
+    parser.add_argument("--skip-stages", type=_stage_list, default=[], help="comma-separated stages to leave out")
+    parser.add_argument(
+        "--dedup",
+        choices=["off", "drop", "copy"],
+        default="off",
+        help="near-duplicate handling: 'drop' removes duplicates before enrichment, "
+             "'copy' enriches one row per cluster and copies results to its duplicates",
+    )
+    parser.add_argument("--dedup-threshold", type=float, default=0.8)
+    parser.add_argument(
+        "--summary-out",
+        default=None,
+        help="write a mergeable analysis summary (see streaming_stats.py) for this partition",
+    )
+    parser.add_argument("--no-sidecar", action="store_true", help="do not write the analysis sidecar")
+    parser.add_argument(
+        "--row-offset",
+        type=int,
+        default=0,
+        help="global row index of this partition's first row, used in summary row references",
+    )
+    parser.add_argument(
+        "--manifest",
+        default=None,
+        help="shard manifest from 'processing.py shard'; in_csv must be one of its shard files",
+    )
+    parser.add_argument(
+        "--csv-engine",
+        choices=["c", "pyarrow", "auto"],
+        default=loader_mod.DEFAULT_ENGINE,
+        help="CSV parser: pandas' default, multithreaded Arrow, or Arrow when installed",
+    )
+    parser.add_argument("--memory-map", action="store_true", help="memory-map local input files")
+    parser.add_argument(
+        "--difficulty-thresholds",
+        default="200,600",
+        help="difficulty cut points: 'LOW,HIGH' (default 200,600), 'quantile' for terciles "
+             "of this run's scores, or 'summary:PATH' for terciles from a streaming_stats summary",
+    )
+    _add_usda_options(parser)
+    args = parser.parse_args(argv)
+
+    args.stages = [st for st in STAGES if st in args.stages and st not in args.skip_stages]
+    if "difficulty" in args.stages:
+        from processing_scripts import difficulty as difficulty_mod
+
+        try:
+            args.difficulty_thresholds = difficulty_mod.parse_thresholds(args.difficulty_thresholds)
+        except ValueError as e:
+            parser.error(str(e))
+    return args
+
+
+def shard_main(argv):
+    parser = argparse.ArgumentParser(prog="processing.py shard", description="Split an input CSV into shards.")
+    parser.add_argument("in_csv")
+    parser.add_argument("out_dir")
+    parser.add_argument("-n", "--num-shards", type=int, required=True)
+    args = parser.parse_args(argv)
+
+    from processing_scripts import sharding as sharding_mod
+
+    manifest = sharding_mod.shard_csv(args.in_csv, args.out_dir, args.num_shards)
+    print(f"✅ {args.num_shards} shards written, manifest: {manifest}")
+
+
+def merge_main(argv):
+    parser = argparse.ArgumentParser(prog="processing.py merge", description="Reassemble processed shards.")
+    parser.add_argument("manifest")
+    parser.add_argument("outputs_dir", help="directory holding processed shards, named like the shard inputs")
+    parser.add_argument("out_csv")
+    parser.add_argument("--usda-caches", nargs="*", default=[], help="per-shard USDA cache files to union")
+    parser.add_argument("--cache-out", default=None, help="merged USDA cache (default: usda_cache.json)")
+    args = parser.parse_args(argv)
+
+    from processing_scripts import sharding as sharding_mod
+
+    sharding_mod.merge_shards(
+        args.manifest,
+        args.outputs_dir,
+        args.out_csv,
+        usda_caches=args.usda_caches,
+        cache_out=args.cache_out,
+    )
+    print(f"✅ merged dataset written: {args.out_csv}")
+
 
-    df = add_course_from_cuisine_path(df)
-    df = cuisine_type_mod.add_cuisine_type(df)
-    df = add_dietary_flags(df, in_csv)
-    df = add_difficulty_simple(df)
+def run_main(argv):
+    args = parse_args(argv)
+    in_csv, out_csv, stages = args.in_csv, args.out_csv, args.stages
+    loader_mod.DEFAULT_ENGINE = args.csv_engine
+    loader_mod.DEFAULT_MEMORY_MAP = args.memory_map
+    print(f"Stages: {', '.join(stages) if stages else '(none)'}")
+
+    # Shard runs: parse with the full file's dtypes and keep global row numbering
+    dtype, row_offset = None, args.row_offset
+    if args.manifest:
+        from processing_scripts import sharding as sharding_mod
+
+        manifest = sharding_mod.load_manifest(args.manifest)
+        dtype = manifest["dtypes"]
+        row_offset = sharding_mod.shard_entry(manifest, in_csv)["row_start"]
+
+    header = loader_mod.read_header(in_csv)
+
+    prep_col = "prep_time" if "prep_time" in header else ("Prep Time" if "Prep Time" in header else None)
+    cook_col = "cook_time" if "cook_time" in header else ("Cook Time" if "Cook Time" in header else None)
+    total_col = "total_time" if "total_time" in header else ("Total Time" if "Total Time" in header else None)
+
+    df = loader_mod.read_csv(in_csv, dtype=dtype)
+
+    # Input may be an earlier output: the selected stages recompute their columns
+    columns_in = list(df.columns)
+    rerun = [c for st in stages for c in STAGE_COLUMNS.get(st, []) if c in columns_in]
+    df = df.drop(columns=rerun)
+    # Labels from the earlier run ("N/A", "None") must pass through as written, not as NaN
+    kept = [
+        c for st in STAGES if st not in stages for c in STAGE_COLUMNS.get(st, [])
+        if c in columns_in and c not in loader_mod.NUMERIC_DTYPES
+    ]
+    if kept:
+        df[kept] = loader_mod.read_csv(in_csv, kept, dtype={c: str for c in kept}, keep_default_na=False)[kept]
+
+    full_df, clusters = None, None
+    if args.dedup != "off":
+        from processing_scripts import dedup as dedup_mod
+
+        clusters = dedup_mod.find_duplicate_clusters(df, threshold=args.dedup_threshold)
+        summary = dedup_mod.dedup_summary(clusters)
+        print(f"Dedup: {summary['duplicate_rows']} duplicate rows in {summary['duplicate_clusters']} clusters")
+        full_df = df
+        df = dedup_mod.drop_duplicates(df, clusters)
+
+    usda_kwargs, prefetch = None, None
+    if "usda" in stages:
+        from processing_scripts import usda_integration as usda_mod
+
+        # USDA lookups (network-bound) start now and run in background threads
+        # while the CPU stages below run; results are joined per row batch.
+        usda_kwargs = dict(
+            ingredients_col="ingredients",
+            # The row limit is global, so later shards get what is left of it
+            max_rows=None if args.max_rows is None else max(args.max_rows - row_offset, 0),
+            max_ingredients=args.max_ingredients,
+            cache_path=args.usda_cache,
+        )
+        if args.usda_workers > 0:
+            prefetch = usda_mod.USDAPrefetcher(df, workers=args.usda_workers, **usda_kwargs).start()
+
+    if "time" in stages:
+        from processing_scripts import data_cleaning as data_cleaning_mod
+
+        df = data_cleaning_mod.standardize_time_columns(df, prep_col=prep_col, cook_col=cook_col, total_col=total_col)
+    if "course" in stages:
+        df = add_course_from_cuisine_path(df)
+    if "cuisine" in stages:
+        from processing_scripts import cuisine_type as cuisine_type_mod
+
+        df = cuisine_type_mod.add_cuisine_type(df)
+    if "dietary" in stages:
+        df = add_dietary_flags(df)
+    if "difficulty" in stages:
+        df = add_difficulty_simple(df, thresholds=args.difficulty_thresholds)
 
     # If total_time missing
     if total_col is None:
-        df["difficulty"] = "N/A"
-        df["cuisine_type"] = "N/A"
+        if "difficulty" in stages:
+            df["difficulty"] = "N/A"
+        if "cuisine" in stages:
+            df["cuisine_type"] = "N/A"
 
-    df = usda_mod.add_usda_calories(
-        df,
-        ingredients_col="ingredients",
-        max_rows=2000             
-    )
+    if prefetch is not None:
+        df = prefetch.apply(df)
+    elif usda_kwargs is not None:
+        df = usda_mod.add_usda_calories(df, **usda_kwargs)
+
+    if args.dedup == "copy":
+        if "time" in stages:
+            full_df = data_cleaning_mod.standardize_time_columns(
+                full_df, prep_col=prep_col, cook_col=cook_col, total_col=total_col
+            )
+        df = dedup_mod.copy_from_representatives(full_df, df, clusters)
+
+    # Recomputed columns go back to where they were in the input
+    if rerun:
+        df = df[[c for c in columns_in if c in df.columns] + [c for c in df.columns if c not in columns_in]]
 
     df.to_csv(out_csv, index=False, mode='w')
     print(f"✅ cleaned dataset written: {out_csv}")
 
+    if not args.no_sidecar:
+        from processing_scripts import data_analysis as analysis_mod
+
+        sidecar = analysis_mod.write_analysis_sidecar(df, out_csv)
+        print(f"✅ analysis sidecar written: {sidecar}")
+
+    if args.summary_out:
+        from processing_scripts import streaming_stats as stats_mod
+
+        stats_mod.PartitionSummary().update(df, row_offset=row_offset).save(args.summary_out)
+        print(f"✅ analysis summary written: {args.summary_out}")
+
+
+def analyze_main(argv):
+    reports = ["calories", "difficulty", "difficulty-scores", "dietary"]
+    parser = argparse.ArgumentParser(prog="processing.py analyze", description="Print analysis reports for an output CSV.")
+    parser.add_argument("csv")
+    parser.add_argument(
+        "--report",
+        choices=reports,
+        action="append",
+        help="report to print (repeatable; default: all). Served from the sidecar when it is fresh",
+    )
+    args = parser.parse_args(argv)
+
+    from processing_scripts import data_analysis as analysis_mod
+
+    analyzers = {
+        "calories": analysis_mod.analyze_calories,
+        "difficulty": analysis_mod.analyze_difficulty,
+        "difficulty-scores": analysis_mod.analyze_difficulty_scores,
+        "dietary": analysis_mod.analyze_by_dietary_restriction,
+    }
+    results = {name: analyzers[name](args.csv) for name in (args.report or reports)}
+    print(json.dumps(results, indent=2, default=str))
+
+
+def warm_cache_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="processing.py warm-cache",
+        description="Fill the USDA cache for an input CSV without running the pipeline.",
+    )
+    parser.add_argument("in_csv")
+    _add_usda_options(parser)
+    args = parser.parse_args(argv)
+
+    from processing_scripts import usda_integration as usda_mod
+
+    # Only the ingredients column is parsed
+    df = loader_mod.read_csv(args.in_csv, ["ingredients"])
+    before = len(usda_mod._load_cache(args.usda_cache))
+    usda_kwargs = dict(max_rows=args.max_rows, max_ingredients=args.max_ingredients, cache_path=args.usda_cache)
+    if args.usda_workers > 0:
+        usda_mod.USDAPrefetcher(df, workers=args.usda_workers, **usda_kwargs).start().apply(df)
+    else:
+        usda_mod.add_usda_calories(df, **usda_kwargs)
+
+    after = len(usda_mod._load_cache(args.usda_cache))
+    print(f"✅ USDA cache warmed: {after} entries ({after - before} new)")
+
+
+def stats_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="processing.py stats",
+        description="Merge analysis summaries of output CSVs and/or saved summary files.",
+    )
+    parser.add_argument("inputs", nargs="+", help="output CSVs, or summaries (.json) from --summary-out / --out")
+    parser.add_argument("--out", default=None, help="also save the merged summary here")
+    args = parser.parse_args(argv)
+
+    from processing_scripts import streaming_stats as stats_mod
+
+    summaries = []
+    for p in args.inputs:
+        try:
+            if p.endswith(".json"):
+                summaries.append(stats_mod.PartitionSummary.load(p))
+            else:
+                summaries.append(stats_mod.summarize_csv(p))
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    merged = stats_mod.merge_summaries(summaries)
+    if args.out:
+        merged.save(args.out)
+    print(json.dumps(merged.reports(), indent=2, default=str))
+    if args.out:
+        print(f"✅ merged summary written: {args.out}")
+
+
+COMMANDS = {
+    "run": run_main,
+    "analyze": analyze_main,
+    "warm-cache": warm_cache_main,
+    "stats": stats_main,
+    "shard": shard_main,
+    "merge": merge_main,
+}
+
+
+def main():
+    argv = sys.argv[1:]
+    if argv and argv[0] in COMMANDS:
+        return COMMANDS[argv[0]](argv[1:])
+
+    if len(argv) < 2:
+        print("Usage: python processing.py run <input.csv> <output.csv> [--stages ...] [--skip-stages ...]")
+        print("       python processing.py analyze <output.csv> [--report ...]")
+        print("       python processing.py warm-cache <input.csv> [--usda-cache PATH]")
+        print("       python processing.py stats <output.csv|summary.json> ... [--out summary.json]")
+        print("       python processing.py shard <input.csv> <shard_dir> -n N")
+        print("       python processing.py merge <manifest.json> <outputs_dir> <output.csv>")
+        print("'python processing.py <input.csv> <output.csv> [...]' is the same as 'run'.")
+        sys.exit(1)
+
+    return run_main(argv)
+
 
 if __name__ == "__main__":
     main()
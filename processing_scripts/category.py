@@ -1,4 +1,6 @@
-import pandas as pd
+from functools import lru_cache
+
+from processing_scripts import csv_loader
 
 def get_unique_top_level_cuisines(csv_path: str):
     """
@@ -8,8 +10,8 @@ def get_unique_top_level_cuisines(csv_path: str):
     Example:
         /Desserts/Fruit Desserts/Apple Dessert Recipes/ → 'Desserts'
     """
-    # Read CSV
-    df = pd.read_csv(csv_path)
+    # Read only the cuisine column(s)
+    df = csv_loader.read_csv(csv_path, lambda c: "cuisine" in c.lower())
     
     # Identify the correct column
     if "cuisine_path" in df.columns:
@@ -28,6 +30,29 @@ def get_unique_top_level_cuisines(csv_path: str):
     # Return unique categories as a list
     return df["top_level_cuisine"].dropna().unique().tolist()
 
+# Simple keyword-based classification rules
+APPETIZERS_KEYWORDS = ["Appetizer", "Snack", "Salad", "Side", "Bread", "Soup"]
+MAIN_DISH_KEYWORDS = ["Main", "Meat", "Poultry", "Seafood", "BBQ", "Grilling", "Cuisine", "Everyday"]
+DESSERT_KEYWORDS = ["Dessert", "Pie", "Cake", "Cookie", "Sweet"]
+
+
+@lru_cache(maxsize=None)
+def cuisine_bucket(item: str) -> str:
+    """
+    Bucket ("Appetizers", "Main Dish" or "Dessert") for one cuisine category.
+    Memoized: a long-lived worker (worker.py) keeps it warm across jobs.
+    """
+    text = item.lower()
+    if any(k.lower() in text for k in DESSERT_KEYWORDS):
+        return "Dessert"
+    if any(k.lower() in text for k in MAIN_DISH_KEYWORDS):
+        return "Main Dish"
+    if any(k.lower() in text for k in APPETIZERS_KEYWORDS):
+        return "Appetizers"
+    # Default to main dish if uncertain
+    return "Main Dish"
+
+
 def categorize_cuisines(cuisine_list):
     """
     Categorizes a list of cuisine categories into:
@@ -37,22 +62,9 @@ def categorize_cuisines(cuisine_list):
     
     Returns a dictionary with these three categories.
     """
-    # Define simple keyword-based classification rules
-    appetizers_keywords = ["Appetizer", "Snack", "Salad", "Side", "Bread", "Soup"]
-    main_dish_keywords = ["Main", "Meat", "Poultry", "Seafood", "BBQ", "Grilling", "Cuisine", "Everyday"]
-    dessert_keywords = ["Dessert", "Pie", "Cake", "Cookie", "Sweet"]
-    
     categorized = {"Appetizers": [], "Main Dish": [], "Dessert": []}
     
     for item in cuisine_list:
-        if any(k.lower() in item.lower() for k in dessert_keywords):
-            categorized["Dessert"].append(item)
-        elif any(k.lower() in item.lower() for k in main_dish_keywords):
-            categorized["Main Dish"].append(item)
-        elif any(k.lower() in item.lower() for k in appetizers_keywords):
-            categorized["Appetizers"].append(item)
-        else:
-            # Default to main dish if uncertain
-            categorized["Main Dish"].append(item)
-
-    return categorized
\ No newline at end of file
+        categorized[cuisine_bucket(item)].append(item)
+
+    return categorized
@@ -0,0 +1,155 @@
+# processing_scripts/csv_loader.py
+
+from __future__ import annotations
+
+import os
+
+import pandas as pd
+
+
+# "c" = pandas' default parser, "pyarrow" = multithreaded Arrow reader,
+# "auto" = pyarrow when installed, else c. processing.py --csv-engine sets this.
+DEFAULT_ENGINE = "c"
+DEFAULT_MEMORY_MAP = False
+
+# Known numeric columns, so they are parsed directly instead of sniffed
+NUMERIC_DTYPES = {
+    "total_calories_usda": "float64",
+    "difficulty_score": "float64",
+    "rating": "float64",
+}
+
+# pandas' default NA strings; Arrow is given the same list so both engines agree
+NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None",
+    "n/a", "nan", "null",
+]
+
+
+def _have_pyarrow() -> bool:
+    try:
+        import pyarrow.csv  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def read_header(path) -> list:
+    """Column names as pandas would name them (empty header -> 'Unnamed: i')."""
+    return pd.read_csv(path, nrows=0).columns.tolist()
+
+
+def resolve_columns(path, columns) -> list | None:
+    """
+    columns may be:
+    - None: all columns
+    - a list of names: names missing from the file are ignored
+    - a callable(name) -> bool, like pandas usecols
+    Returns the matching names in file order, or None for all columns.
+    """
+    if columns is None:
+        return None
+    header = read_header(path)
+    if callable(columns):
+        return [c for c in header if columns(c)]
+    wanted = set(columns)
+    return [c for c in header if c in wanted]
+
+
+def _resolve_engine(engine):
+    engine = engine or DEFAULT_ENGINE
+    if engine == "auto":
+        return "pyarrow" if _have_pyarrow() else "c"
+    if engine == "pyarrow" and not _have_pyarrow():
+        print("⚠ pyarrow not installed, falling back to the default CSV parser")
+        return "c"
+    return engine
+
+
+def _arrow_type(dtype):
+    import pyarrow as pa
+
+    return {
+        "float64": pa.float64(),
+        "int64": pa.int64(),
+        "bool": pa.bool_(),
+        "str": pa.string(),
+        "object": pa.string(),
+        str: pa.string(),
+        float: pa.float64(),
+        int: pa.int64(),
+    }.get(dtype)
+
+
+def _read_csv_arrow(path, usecols, dtype, memory_map):
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    header = read_header(path)
+    # Arrow sees the raw header; map pandas' 'Unnamed: i' back to it
+    raw_names = [("" if c.startswith("Unnamed: ") else c) for c in header]
+    rename = {raw: c for raw, c in zip(raw_names, header) if raw != c}
+    include = None if usecols is None else [raw_names[header.index(c)] for c in usecols]
+
+    column_types = {}
+    leftover = {}
+    for col, t in (dtype or {}).items():
+        if col not in header:
+            continue
+        at = _arrow_type(t)
+        if at is not None:
+            column_types[raw_names[header.index(col)]] = at
+        else:
+            leftover[col] = t
+
+    source = pa.memory_map(str(path)) if memory_map else str(path)
+    table = pacsv.read_csv(
+        source,
+        read_options=pacsv.ReadOptions(use_threads=True),
+        # directions/ingredients contain quoted newlines
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=include,
+            column_types=column_types,
+            null_values=NA_VALUES,
+            strings_can_be_null=True,
+        ),
+    )
+    df = table.to_pandas()
+    if rename:
+        df = df.rename(columns=rename)
+    if leftover:
+        df = df.astype(leftover)
+    return df
+
+
+def read_csv(path, columns=None, *, dtype=None, engine=None, memory_map: bool | None = None, **kwargs) -> pd.DataFrame:
+    """
+    Shared CSV loader for all stages.
+
+    - columns: projection (see resolve_columns); only these are parsed
+    - dtype: explicit dtype map; entries for columns not loaded are ignored
+    - engine: "c", "pyarrow" (multithreaded) or "auto"; defaults to DEFAULT_ENGINE
+    - memory_map: map a local file instead of buffered reads; defaults to DEFAULT_MEMORY_MAP
+
+    Extra kwargs (nrows, chunksize, ...) go to pandas and force the "c" engine.
+    """
+    usecols = resolve_columns(path, columns)
+    if dtype is not None and usecols is not None:
+        dtype = {c: t for c, t in dtype.items() if c in usecols}
+
+    # Nothing matched: still read one column so the frame keeps its row count
+    if usecols == []:
+        first = read_header(path)[:1]
+        if first:
+            return read_csv(path, first, engine=engine, memory_map=memory_map, **kwargs)[[]]
+
+    if memory_map is None:
+        memory_map = DEFAULT_MEMORY_MAP
+    memory_map = memory_map and isinstance(path, (str, os.PathLike)) and os.path.isfile(path)
+
+    if not kwargs and _resolve_engine(engine) == "pyarrow":
+        return _read_csv_arrow(path, usecols, dtype, memory_map)
+
+    return pd.read_csv(path, usecols=usecols, dtype=dtype, memory_map=memory_map, **kwargs)
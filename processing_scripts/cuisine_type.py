@@ -2,6 +2,8 @@ from __future__ import annotations
 import re
 import pandas as pd
 
+from processing_scripts import csv_loader
+
 CONTROLLED_CUISINES = [
     "american", "chinese", "japanese", "korean", "thai", "vietnamese",
     "indian", "middle_eastern", "mediterranean", "italian", "french",
@@ -42,6 +44,8 @@ def add_cuisine_type(df: pd.DataFrame, *, path_col: str = "cuisine_path") -> pd.
     return df
 
 def categorize_cuisine_type(csv_path: str, *, path_col: str = "cuisine_path") -> pd.DataFrame:
-    df = pd.read_csv(csv_path)
+    df = csv_loader.read_csv(
+        csv_path, lambda c: c == path_col or ("cuisine" in c.lower() and "path" in c.lower())
+    )
     df2 = add_cuisine_type(df, path_col=path_col)
     return df2[["cuisine_type"]]
@@ -1,5 +1,118 @@
+import copy
+import hashlib
+import json
+import os
+
 import pandas as pd
 
+from processing_scripts import csv_loader
+
+# Distinct from streaming_stats summaries (*.summary.json), which processing.py stats loads
+SIDECAR_SUFFIX = ".analysis.json"
+# 2: NA labels are counted as missing, as on the CSV path (version 1 counted 'N/A')
+SIDECAR_VERSION = 2
+SIDECAR_COLUMNS = ["recipe_name", "total_calories_usda", "difficulty", "difficulty_score", "dietary_restrictions"]
+
+# (path, size, mtime_ns) -> verified sidecar, so repeated calls skip rehashing
+_fresh_sidecars = {}
+
+
+def sidecar_path(file_path):
+    return str(file_path) + SIDECAR_SUFFIX
+
+
+def file_sha256(file_path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _json_default(value):
+    # numpy scalars from pandas reductions
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def as_read_back(df, columns=None):
+    """
+    Copy of df (optionally only the given columns that exist) as a fresh
+    csv_loader.read_csv of the written output would see it: numeric
+    metrics as floats, and NA strings ("N/A", "None", ...) as NaN.
+    Reports computed on it match reports computed from the CSV.
+    """
+    cols = [c for c in (columns if columns is not None else df.columns) if c in df.columns]
+    frame = df[cols].reset_index(drop=True).copy()
+    for col in frame.columns:
+        if col in csv_loader.NUMERIC_DTYPES:
+            frame[col] = pd.to_numeric(frame[col], errors="coerce")
+        else:
+            frame[col] = frame[col].where(~frame[col].isin(csv_loader.NA_VALUES))
+    return frame
+
+
+def write_analysis_sidecar(df, csv_path):
+    """
+    Computes every analyze_* report from the in-memory output frame and
+    writes them next to csv_path, tagged with the CSV's sha256.
+    Call after the CSV has been written.
+    """
+    frame = as_read_back(df, SIDECAR_COLUMNS)
+
+    sidecar = {
+        "version": SIDECAR_VERSION,
+        "source": os.path.basename(str(csv_path)),
+        "sha256": file_sha256(csv_path),
+        "rows": len(frame),
+        "reports": {
+            "analyze_calories": analyze_calories_df(frame),
+            "analyze_difficulty": analyze_difficulty_df(frame),
+            "analyze_difficulty_scores": analyze_difficulty_scores_df(frame),
+            "analyze_by_dietary_restriction": analyze_by_dietary_restriction_df(frame),
+        },
+    }
+    path = sidecar_path(csv_path)
+    with open(path, "w") as f:
+        json.dump(sidecar, f, default=_json_default)
+    return path
+
+
+def load_fresh_sidecar(file_path):
+    """Returns the sidecar dict if it exists and matches the CSV's hash, else None."""
+    path = sidecar_path(file_path)
+    try:
+        st = os.stat(file_path)
+        side_mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+    key = (os.path.abspath(str(file_path)), st.st_size, st.st_mtime_ns, side_mtime)
+    if key in _fresh_sidecars:
+        return _fresh_sidecars[key]
+
+    try:
+        with open(path) as f:
+            sidecar = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if sidecar.get("version") != SIDECAR_VERSION or sidecar.get("sha256") != file_sha256(file_path):
+        return None
+
+    _fresh_sidecars[key] = sidecar
+    return sidecar
+
+
+def _report_from_sidecar(file_path, name):
+    sidecar = load_fresh_sidecar(file_path)
+    if sidecar is None:
+        return None
+    # Callers may mutate the report; keep the cached sidecar intact
+    return copy.deepcopy(sidecar["reports"].get(name))
+
+
 def analyze_calories(file_path):
     """
     Analyzes the 'total_calories_usda' column of a CSV file.
@@ -12,11 +125,19 @@ def analyze_calories(file_path):
               75th percentile, minimum, and maximum calories, along with
               the recipe names and row indices for the min, median, and max calories.
     """
+    cached = _report_from_sidecar(file_path, "analyze_calories")
+    if cached is not None:
+        return cached
+
     try:
-        df = pd.read_csv(file_path)
+        df = csv_loader.read_csv(file_path, ["total_calories_usda", "recipe_name"], dtype=csv_loader.NUMERIC_DTYPES)
     except FileNotFoundError:
         return {"error": f"File not found at {file_path}"}
 
+    return analyze_calories_df(df)
+
+def analyze_calories_df(df):
+    """Same as analyze_calories, on an already-loaded DataFrame (index = output row number)."""
     if 'total_calories_usda' not in df.columns:
         return {"error": "'total_calories_usda' column not found in the CSV."}
 
@@ -63,11 +184,19 @@ def analyze_difficulty(file_path):
     Returns:
         dict: A dictionary containing the counts for each difficulty level.
     """
+    cached = _report_from_sidecar(file_path, "analyze_difficulty")
+    if cached is not None:
+        return cached
+
     try:
-        df = pd.read_csv(file_path)
+        df = csv_loader.read_csv(file_path, ["difficulty"], dtype=csv_loader.NUMERIC_DTYPES)
     except FileNotFoundError:
         return {"error": f"File not found at {file_path}"}
 
+    return analyze_difficulty_df(df)
+
+def analyze_difficulty_df(df):
+    """Same as analyze_difficulty, on an already-loaded DataFrame (index = output row number)."""
     if 'difficulty' not in df.columns:
         return {"error": "'difficulty' column not found in the CSV."}
 
@@ -86,11 +215,19 @@ def analyze_difficulty_scores(file_path):
         dict: A dictionary containing the min, median, mean, and max difficulty scores,
               along with recipe names and row indices for these scores.
     """
+    cached = _report_from_sidecar(file_path, "analyze_difficulty_scores")
+    if cached is not None:
+        return cached
+
     try:
-        df = pd.read_csv(file_path)
+        df = csv_loader.read_csv(file_path, ["difficulty_score", "recipe_name"], dtype=csv_loader.NUMERIC_DTYPES)
     except FileNotFoundError:
         return {"error": f"File not found at {file_path}"}
 
+    return analyze_difficulty_scores_df(df)
+
+def analyze_difficulty_scores_df(df):
+    """Same as analyze_difficulty_scores, on an already-loaded DataFrame (index = output row number)."""
     if 'difficulty_score' not in df.columns:
         return {"error": "'difficulty_score' column not found in the CSV."}
 
@@ -133,11 +270,23 @@ def analyze_by_dietary_restriction(file_path):
     Returns:
         dict: A nested dictionary with analysis for each dietary restriction.
     """
+    cached = _report_from_sidecar(file_path, "analyze_by_dietary_restriction")
+    if cached is not None:
+        return cached
+
     try:
-        df = pd.read_csv(file_path)
+        df = csv_loader.read_csv(
+            file_path,
+            ["dietary_restrictions", "total_calories_usda", "difficulty_score", "recipe_name"],
+            dtype=csv_loader.NUMERIC_DTYPES,
+        )
     except FileNotFoundError:
         return {"error": f"File not found at {file_path}"}
 
+    return analyze_by_dietary_restriction_df(df)
+
+def analyze_by_dietary_restriction_df(df):
+    """Same as analyze_by_dietary_restriction, on an already-loaded DataFrame (index = output row number)."""
     if 'dietary_restrictions' not in df.columns:
         return {"error": "'dietary_restrictions' column not found in the CSV."}
     if 'total_calories_usda' not in df.columns:
@@ -4,9 +4,11 @@ import re
 import pandas as pd
 import numpy as np
 
+from processing_scripts import csv_loader
+
 
 def fill_missing_times_with_zero_df(input_csv, prep_col="prep_time", cook_col="cook_time", total_col="total_time"):
-    df = pd.read_csv(input_csv)
+    df = csv_loader.read_csv(input_csv)
 
     for col in [prep_col, cook_col, total_col]:
         if col not in df.columns:
@@ -31,47 +33,55 @@ def fill_missing_times_with_zero_df(input_csv, prep_col="prep_time", cook_col="c
     return df
 
 
-def standardize_time_columns_df(input_csv, prep_col="prep_time", cook_col="cook_time", total_col="total_time"):
-    df = pd.read_csv(input_csv)
+def _parse_time_to_minutes(value):
+    if pd.isna(value):
+        return 0
+    if isinstance(value, (int, float)):
+        return int(round(value))
 
-    def parse_time_to_minutes(value):
-        if pd.isna(value):
-            return 0
-        if isinstance(value, (int, float)):
-            return int(round(value))
+    text = str(value).lower().strip()
 
-        text = str(value).lower().strip()
+    iso = re.match(r"pt(?:(\d+(?:\.\d+)?)h)?(?:(\d+(?:\.\d+)?)m)?", text)
+    if iso:
+        h = float(iso.group(1) or 0)
+        m = float(iso.group(2) or 0)
+        return int(round(h * 60 + m))
 
-        iso = re.match(r"pt(?:(\d+(?:\.\d+)?)h)?(?:(\d+(?:\.\d+)?)m)?", text)
-        if iso:
-            h = float(iso.group(1) or 0)
-            m = float(iso.group(2) or 0)
-            return int(round(h * 60 + m))
+    hours = re.findall(r"(\d+(?:\.\d+)?)\s*(?:h|hr|hour|hours)", text)
+    minutes = re.findall(r"(\d+(?:\.\d+)?)\s*(?:m|min|mins|minute|minutes)", text)
 
-        hours = re.findall(r"(\d+(?:\.\d+)?)\s*(?:h|hr|hour|hours)", text)
-        minutes = re.findall(r"(\d+(?:\.\d+)?)\s*(?:m|min|mins|minute|minutes)", text)
+    h = float(hours[0]) if hours else 0.0
+    m = float(minutes[0]) if minutes else 0.0
 
-        h = float(hours[0]) if hours else 0.0
-        m = float(minutes[0]) if minutes else 0.0
+    if not hours and not minutes:
+        nums = re.findall(r"\d+(?:\.\d+)?", text)
+        if nums:
+            m = float(nums[0])
 
-        if not hours and not minutes:
-            nums = re.findall(r"\d+(?:\.\d+)?", text)
-            if nums:
-                m = float(nums[0])
+    return int(round(h * 60 + m))
 
-        return int(round(h * 60 + m))
+
+def standardize_time_columns_df(input_csv, prep_col="prep_time", cook_col="cook_time", total_col="total_time", dtype=None):
+    # All columns are needed: they pass through to the output
+    df = csv_loader.read_csv(input_csv, dtype=dtype)
+    return standardize_time_columns(df, prep_col=prep_col, cook_col=cook_col, total_col=total_col)
+
+
+def standardize_time_columns(df, prep_col="prep_time", cook_col="cook_time", total_col="total_time"):
+    """Same as standardize_time_columns_df, on an already-loaded DataFrame (returns a copy)."""
+    df = df.copy()
 
     if prep_col in df.columns:
-        df[prep_col] = df[prep_col].apply(parse_time_to_minutes).astype(int)
+        df[prep_col] = df[prep_col].apply(_parse_time_to_minutes).astype(int)
     
     if cook_col in df.columns:
-        df[cook_col] = df[cook_col].apply(parse_time_to_minutes).astype(int)
+        df[cook_col] = df[cook_col].apply(_parse_time_to_minutes).astype(int)
 
     if total_col in df.columns:
-        df[total_col] = df[total_col].apply(parse_time_to_minutes).astype(int)
+        df[total_col] = df[total_col].apply(_parse_time_to_minutes).astype(int)
     else:
-        prep_vals = df[prep_col].apply(parse_time_to_minutes) if prep_col in df.columns else 0
-        cook_vals = df[cook_col].apply(parse_time_to_minutes) if cook_col in df.columns else 0
+        prep_vals = df[prep_col].apply(_parse_time_to_minutes) if prep_col in df.columns else 0
+        cook_vals = df[cook_col].apply(_parse_time_to_minutes) if cook_col in df.columns else 0
         df[total_col] = (prep_vals + cook_vals).astype(int)
 
     return df
@@ -1,14 +1,27 @@
 import pandas as pd
 
+from processing_scripts import csv_loader
+
+TEXT_KEYWORDS = ["ingredient", "title", "cuisine"]
+
 def categorize_dietary_labels(csv_path: str):
     """
     Creates a single column 'dietary_restrictions'
     listing all applicable dietary labels (e.g. 'Vegetarian, Nut-Free').
     """
-    df = pd.read_csv(csv_path)
+    df = csv_loader.read_csv(csv_path, lambda c: any(k in c.lower() for k in TEXT_KEYWORDS))
+    return dietary_labels_for_df(df)
+
+
+def dietary_labels_for_df(df: pd.DataFrame):
+    """
+    Same as categorize_dietary_labels, on an already-loaded DataFrame.
+    The caller's frame is not modified.
+    """
+    df = df.copy()
     df.columns = df.columns.str.lower()
 
-    text_cols = [c for c in df.columns if any(k in c for k in ["ingredient", "title", "cuisine"])]
+    text_cols = [c for c in df.columns if any(k in c for k in TEXT_KEYWORDS)]
     if not text_cols:
         raise ValueError("No ingredient/title/cuisine column found for dietary inference.")
 
@@ -1,18 +1,28 @@
 import ast
+import numpy as np
 import pandas as pd
 
+from processing_scripts import csv_loader
+
+# Score cut points: < first -> easy, < second -> medium, else hard
+DEFAULT_THRESHOLDS = (200.0, 600.0)
+LEVELS = ["easy", "medium", "hard"]
+
 def _count_steps(val) -> int:
     if val is None:
         return 0
     s = str(val).strip()
     if not s:
         return 0
-    try:
-        maybe = ast.literal_eval(s)
-        if isinstance(maybe, list):
-            return sum(1 for x in maybe if str(x).strip())
-    except Exception:
-        pass
+    # Only a "[...]" string can literal_eval to a list; skipping the attempt
+    # on prose avoids a SyntaxError per row
+    if s.startswith("["):
+        try:
+            maybe = ast.literal_eval(s)
+            if isinstance(maybe, list):
+                return sum(1 for x in maybe if str(x).strip())
+        except Exception:
+            pass
     parts = [x.strip() for x in s.split("\n") if x.strip()]
     if len(parts) <= 1:
         parts = [x.strip() for x in s.split(".") if x.strip()]
@@ -24,18 +34,106 @@ def _to_minutes(x) -> float:
     except Exception:
         return 0.0
 
-def _bucket(score: float) -> str:
-    if score < 200:
-        return "easy"
-    elif score < 600:
-        return "medium"
-    else:
-        return "hard"
+def count_steps(directions: pd.Series) -> pd.Series:
+    return directions.map(_count_steps).astype(int)
+
+def to_minutes(times: pd.Series) -> pd.Series:
+    """
+    Vectorized _to_minutes: numeric coercion in one pass; only values that
+    pandas cannot coerce (rare) go through the per-value fallback.
+    """
+    mins = pd.to_numeric(times, errors="coerce").astype(float)
+    leftover = mins.isna() & times.notna()
+    if leftover.any():
+        mins[leftover] = times[leftover].map(_to_minutes)
+    return mins.clip(lower=0.0)
+
+def difficulty_scores(times: pd.Series, directions: pd.Series) -> pd.Series:
+    """difficulty_score = total_time * number_of_directions, rounded to 2 places."""
+    return (to_minutes(times) * count_steps(directions)).round(2)
+
+def bucket_scores(scores: pd.Series, thresholds=DEFAULT_THRESHOLDS, *, zero_as_na: bool = False) -> pd.Series:
+    """
+    Vectorized bucketing. NaN scores fall through to "hard".
+    With zero_as_na, a score of exactly 0 maps to "N/A".
+    """
+    low, high = thresholds
+    conditions = [scores < low, scores < high]
+    choices = LEVELS[:2]
+    if zero_as_na:
+        conditions.insert(0, scores == 0)
+        choices = ["N/A"] + choices
+    labels = np.select(conditions, choices, default=LEVELS[2])
+    return pd.Series(labels.tolist(), index=scores.index)
+
+def quantile_thresholds(scores: pd.Series, quantiles=(1 / 3, 2 / 3)) -> tuple:
+    """
+    Data-driven cut points: terciles of the non-zero scores, so each level
+    holds about a third of the scored recipes. Falls back to the defaults
+    when there is nothing to measure.
+    """
+    values = pd.to_numeric(scores, errors="coerce").to_numpy(dtype=float)
+    values = values[np.isfinite(values) & (values != 0)]
+    if values.size == 0:
+        return DEFAULT_THRESHOLDS
+    low, high = np.quantile(values, quantiles)
+    return float(low), float(high)
+
+def thresholds_from_summary(summary, quantiles=(1 / 3, 2 / 3)) -> tuple:
+    """
+    Same cut points from a streaming_stats.PartitionSummary (KLL sketch),
+    for chunked or sharded runs that never hold every score at once.
+    Zero (N/A) scores are included in the sketch, so the quantiles are
+    taken over the non-zero part of the rank range.
+    """
+    metric = summary.metrics["difficulty_score"]
+    if metric.count == 0:
+        return DEFAULT_THRESHOLDS
+    sketch = metric.sketch
+    # Scores are >= 0, so the mass at or below 0 is the N/A share
+    zero_frac = sketch.cdf(0.0)
+    if zero_frac >= 1:
+        return DEFAULT_THRESHOLDS
+    low, high = (sketch.quantile(zero_frac + q * (1 - zero_frac)) for q in quantiles)
+    return float(low), float(high)
+
+def parse_thresholds(spec: str):
+    """
+    --difficulty-thresholds values:
+    - "200,600": fixed cut points
+    - "quantile": terciles of this run's scores
+    - "summary:PATH": terciles from a saved streaming_stats summary
+    """
+    if spec == "quantile":
+        return "quantile"
+    if spec.startswith("summary:"):
+        from processing_scripts import streaming_stats
+
+        path = spec[len("summary:"):]
+        try:
+            summary = streaming_stats.PartitionSummary.load(path)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Cannot read difficulty summary: {e}")
+        return thresholds_from_summary(summary)
+    try:
+        low, high = (float(x) for x in spec.split(","))
+    except ValueError:
+        raise ValueError(f"Invalid difficulty thresholds: {spec!r} (expected 'LOW,HIGH', 'quantile' or 'summary:PATH')")
+    if low > high:
+        raise ValueError("Difficulty thresholds must be in increasing order.")
+    return low, high
 
-def add_difficulty(df: pd.DataFrame, *, time_col: str = "total_time", directions_col: str = "directions") -> pd.DataFrame:
+def add_difficulty(
+    df: pd.DataFrame,
+    *,
+    time_col: str = "total_time",
+    directions_col: str = "directions",
+    thresholds=DEFAULT_THRESHOLDS,
+) -> pd.DataFrame:
     """
     - difficulty_score = total_time * number_of_directions
     - difficulty ∈ {easy, medium, hard}
+    - thresholds: (low, high) cut points, or "quantile" for terciles of these scores
     """
     df = df.copy()
 
@@ -46,10 +144,10 @@ def add_difficulty(df: pd.DataFrame, *, time_col: str = "total_time", directions
         df["_tmp_dir_"] = ""
         directions_col = "_tmp_dir_"
 
-    steps = df[directions_col].apply(_count_steps)
-    mins = df[time_col].apply(_to_minutes)
-    df["difficulty_score"] = (mins * steps).round(2)
-    df["difficulty"] = df["difficulty_score"].apply(_bucket)
+    df["difficulty_score"] = difficulty_scores(df[time_col], df[directions_col])
+    if thresholds == "quantile":
+        thresholds = quantile_thresholds(df["difficulty_score"])
+    df["difficulty"] = bucket_scores(df["difficulty_score"], thresholds)
 
     for c in ["_tmp_time_", "_tmp_dir_"]:
         if c in df.columns:
@@ -57,6 +155,6 @@ def add_difficulty(df: pd.DataFrame, *, time_col: str = "total_time", directions
     return df
 
 def categorize_difficulty(csv_path: str, *, time_col: str = "total_time", directions_col: str = "directions") -> pd.DataFrame:
-    df = pd.read_csv(csv_path)
+    df = csv_loader.read_csv(csv_path, [time_col, directions_col])
     df2 = add_difficulty(df, time_col=time_col, directions_col=directions_col)
     return df2[["difficulty_score", "difficulty"]]
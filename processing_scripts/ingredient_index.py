@@ -0,0 +1,292 @@
+# processing_scripts/ingredient_index.py
+
+from __future__ import annotations
+
+import json
+import mmap
+import struct
+
+import pandas as pd
+
+from processing_scripts import csv_loader
+from processing_scripts.usda_integration import clean_ingredient, parse_ingredients_field
+
+
+MAGIC = b"INGIDX1\n"
+_HEADER_LEN = struct.Struct("<Q")
+
+
+def _encode_postings(row_ids) -> bytes:
+    """
+    Delta + varint encoding of a sorted list of row ids.
+    Small gaps (the common case) take a single byte each.
+    """
+    out = bytearray()
+    prev = 0
+    for rid in row_ids:
+        gap = rid - prev
+        prev = rid
+        while gap >= 0x80:
+            out.append((gap & 0x7F) | 0x80)
+            gap >>= 7
+        out.append(gap)
+    return bytes(out)
+
+
+def _decode_postings(buf) -> list:
+    ids = []
+    cur = 0
+    shift = 0
+    gap = 0
+    for b in buf:
+        gap |= (b & 0x7F) << shift
+        if b & 0x80:
+            shift += 7
+            continue
+        cur += gap
+        ids.append(cur)
+        gap = 0
+        shift = 0
+    return ids
+
+
+def _find_ingredients_col(df: pd.DataFrame, ingredients_col: str):
+    if ingredients_col in df.columns:
+        return ingredients_col
+    return next((c for c in df.columns if "ingredient" in c.lower()), None)
+
+
+class IngredientIndex:
+    """
+    Inverted index: normalized ingredient name -> compressed posting list
+    of recipe row ids (positions in the source CSV, 0-based).
+
+    Ingredient names are normalized with usda_integration.clean_ingredient,
+    so "2 cups raw cashews" and "raw cashews" land on the same key.
+
+    Example:
+        idx = build_ingredient_index_from_csv("input_data/recipes.csv")
+        idx.query(include=["cashews"])
+        idx.query(exclude=["egg", "milk", "butter"])
+        idx.save("recipes.ingidx")
+        idx = IngredientIndex.load("recipes.ingidx")   # memory-mapped
+    """
+
+    def __init__(self, terms: dict, blob, num_rows: int, mm=None, fh=None):
+        # terms: key -> (offset, length, count) into blob
+        self._terms = terms
+        self._blob = blob
+        self._mm = mm
+        self._fh = fh
+        self.num_rows = num_rows
+        self._decoded = {}
+
+        # word -> keys containing that word, for partial-name lookups
+        self._word_keys = {}
+        for key in terms:
+            for word in key.split():
+                self._word_keys.setdefault(word, set()).add(key)
+
+    @classmethod
+    def from_postings(cls, postings: dict, num_rows: int) -> "IngredientIndex":
+        terms = {}
+        blob = bytearray()
+        for key in sorted(postings):
+            ids = sorted(postings[key])
+            enc = _encode_postings(ids)
+            terms[key] = (len(blob), len(enc), len(ids))
+            blob.extend(enc)
+        return cls(terms, bytes(blob), num_rows)
+
+    def __len__(self):
+        return len(self._terms)
+
+    def __contains__(self, name):
+        return bool(self._resolve_keys(name))
+
+    def ingredients(self):
+        """All normalized ingredient keys in the index (sorted)."""
+        return sorted(self._terms)
+
+    def _postings_for_key(self, key: str) -> frozenset:
+        cached = self._decoded.get(key)
+        if cached is not None:
+            return cached
+        off, length, _ = self._terms[key]
+        ids = frozenset(_decode_postings(self._blob[off:off + length]))
+        self._decoded[key] = ids
+        return ids
+
+    def _resolve_keys(self, name: str):
+        """
+        The exact normalized key (if present) plus every key that contains
+        all words of the normalized query, so "eggs" also covers "large eggs"
+        and "egg yolks", and "cashew" covers "raw cashews".
+        """
+        cleaned = clean_ingredient(name) or str(name).strip().lower()
+        keys = {cleaned} if cleaned in self._terms else set()
+        words = cleaned.split()
+        if not words:
+            return keys
+        matched = self._keys_for_word(words[0])
+        for w in words[1:]:
+            matched &= self._keys_for_word(w)
+        return keys | matched
+
+    def _keys_for_word(self, word: str) -> set:
+        # Treat simple plurals as the same word ("egg" / "eggs")
+        stem = word[:-1] if word.endswith("s") else word
+        keys = set()
+        for w in (stem, stem + "s", stem + "es"):
+            keys |= self._word_keys.get(w, set())
+        return keys
+
+    def recipes_with(self, name: str) -> frozenset:
+        """Row ids of recipes using the given ingredient."""
+        keys = self._resolve_keys(name)
+        if len(keys) == 1:
+            return self._postings_for_key(next(iter(keys)))
+        result = set()
+        for k in keys:
+            result |= self._postings_for_key(k)
+        return frozenset(result)
+
+    def count(self, name: str) -> int:
+        keys = self._resolve_keys(name)
+        if len(keys) == 1:
+            return self._terms[next(iter(keys))][2]
+        return len(self.recipes_with(name))
+
+    def query(self, include=(), exclude=(), any_of=()) -> list:
+        """
+        Set algebra over posting lists.
+
+        - include: recipes must contain ALL of these ingredients
+        - any_of:  recipes must contain AT LEAST ONE of these
+        - exclude: recipes must contain NONE of these
+
+        With no include/any_of terms, the universe is every row in the index.
+        Returns a sorted list of row ids.
+        """
+        if isinstance(include, str):
+            include = [include]
+        if isinstance(exclude, str):
+            exclude = [exclude]
+        if isinstance(any_of, str):
+            any_of = [any_of]
+
+        result = None
+        # Intersect smallest posting lists first
+        for ids in sorted((self.recipes_with(n) for n in include), key=len):
+            result = set(ids) if result is None else result & ids
+            if not result:
+                return []
+
+        if any_of:
+            union = set()
+            for n in any_of:
+                union |= self.recipes_with(n)
+            result = union if result is None else result & union
+
+        if result is None:
+            result = set(range(self.num_rows))
+
+        for n in exclude:
+            result -= self.recipes_with(n)
+
+        return sorted(result)
+
+    def save(self, path) -> None:
+        """
+        On-disk layout:
+            MAGIC | u64 header length | JSON header | posting blob
+        The header holds the term dictionary; the blob is never parsed on load.
+        """
+        blob = bytes(self._blob)
+        header = json.dumps({
+            "num_rows": self.num_rows,
+            "terms": self._terms,
+        }).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            f.write(_HEADER_LEN.pack(len(header)))
+            f.write(header)
+            f.write(blob)
+
+    @classmethod
+    def load(cls, path) -> "IngredientIndex":
+        """Memory-map an index written by save(); posting lists decode lazily."""
+        fh = open(path, "rb")
+        try:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            fh.close()
+            raise ValueError(f"Empty or invalid ingredient index: {path}")
+
+        if mm[:len(MAGIC)] != MAGIC:
+            mm.close()
+            fh.close()
+            raise ValueError(f"Not an ingredient index file: {path}")
+
+        pos = len(MAGIC)
+        (hlen,) = _HEADER_LEN.unpack_from(mm, pos)
+        pos += _HEADER_LEN.size
+        header = json.loads(mm[pos:pos + hlen].decode("utf-8"))
+        pos += hlen
+
+        terms = {k: tuple(v) for k, v in header["terms"].items()}
+        blob = memoryview(mm)[pos:]
+        return cls(terms, blob, header["num_rows"], mm=mm, fh=fh)
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._blob.release()
+            self._mm.close()
+            self._fh.close()
+            self._mm = None
+            self._fh = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def build_ingredient_index(df: pd.DataFrame, *, ingredients_col: str = "ingredients") -> IngredientIndex:
+    """
+    Builds an IngredientIndex from a DataFrame. Row ids are positional
+    (0..len(df)-1), matching the row order of the CSV the frame was read from.
+    """
+    col = _find_ingredients_col(df, ingredients_col)
+    if col is None:
+        raise ValueError("No ingredients column found for ingredient index.")
+
+    postings = {}
+    for row_id, val in enumerate(df[col]):
+        for raw in parse_ingredients_field(val):
+            key = clean_ingredient(raw)
+            if not key:
+                continue
+            ids = postings.setdefault(key, [])
+            if not ids or ids[-1] != row_id:
+                ids.append(row_id)
+
+    return IngredientIndex.from_postings(postings, len(df))
+
+
+def build_ingredient_index_from_csv(csv_path: str, *, ingredients_col: str = "ingredients") -> IngredientIndex:
+    df = csv_loader.read_csv(csv_path, lambda c: c == ingredients_col or "ingredient" in c.lower())
+    return build_ingredient_index(df, ingredients_col=ingredients_col)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 3:
+        print("Usage: python -m processing_scripts.ingredient_index <input.csv> <out.ingidx>")
+        sys.exit(1)
+
+    idx = build_ingredient_index_from_csv(sys.argv[1])
+    idx.save(sys.argv[2])
+    print(f"✅ ingredient index written: {sys.argv[2]} ({len(idx)} ingredients, {idx.num_rows} recipes)")
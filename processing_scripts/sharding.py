@@ -0,0 +1,193 @@
+# processing_scripts/sharding.py
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import os
+import sys
+
+from processing_scripts import csv_loader
+from processing_scripts import data_analysis as analysis_mod
+
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+# Large recipe fields (directions) can exceed the csv module's default limit
+csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+
+
+def _iter_records(src, dst_for_record):
+    """
+    Walks CSV records of an open file and copies each record's raw lines
+    to dst_for_record(record_number) (or nowhere if it returns None).
+
+    csv.reader only finds record boundaries (quoted newlines in directions
+    etc.); the bytes written are the original lines, untouched.
+    Record 0 is the header.
+    """
+    state = {"dst": None}
+
+    def tee():
+        for line in src:
+            if state["dst"] is not None:
+                state["dst"].write(line)
+            yield line
+
+    reader = csv.reader(tee())
+    n = 0
+    while True:
+        state["dst"] = dst_for_record(n)
+        # the reader consumes exactly the lines of one record per next()
+        if next(reader, None) is None:
+            return n
+        n += 1
+
+
+def count_records(csv_path) -> int:
+    """Number of data rows (header excluded)."""
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        return max(_iter_records(f, lambda i: None) - 1, 0)
+
+
+def _shard_bounds(num_rows: int, num_shards: int):
+    base, extra = divmod(num_rows, num_shards)
+    start = 0
+    for i in range(num_shards):
+        size = base + (1 if i < extra else 0)
+        yield start, size
+        start += size
+
+
+def shard_csv(in_csv, out_dir, num_shards: int) -> str:
+    """
+    Splits in_csv into num_shards contiguous partitions (shard i holds
+    rows [row_start, row_start + rows)). Shard files are byte-for-byte
+    copies of the original records, each with the original header.
+
+    The manifest also records the column dtypes pandas infers on the full
+    file; processing.py reads each shard with that dtype map so a shard
+    parses exactly like its rows would in a single-node run.
+
+    Returns the manifest path.
+    """
+    if num_shards < 1:
+        raise ValueError("num_shards must be >= 1")
+
+    os.makedirs(out_dir, exist_ok=True)
+    num_rows = count_records(in_csv)
+    # The C parser's inference, whatever --csv-engine the shard runs use
+    dtypes = {c: str(t) for c, t in csv_loader.read_csv(in_csv, engine="c").dtypes.items()}
+
+    shards = []
+    for i, (start, size) in enumerate(_shard_bounds(num_rows, num_shards)):
+        name = f"part-{i:05d}.csv"
+        shards.append({
+            "index": i,
+            "file": name,
+            "row_start": start,
+            "rows": size,
+            "usda_cache": f"part-{i:05d}.usda_cache.json",
+        })
+
+    # Record n (1-based data row n-1) -> shard file; header goes to every shard
+    handles = [open(os.path.join(out_dir, s["file"]), "w", newline="", encoding="utf-8") for s in shards]
+    ends = [s["row_start"] + s["rows"] for s in shards]
+    header = io.StringIO()
+
+    try:
+        with open(in_csv, newline="", encoding="utf-8") as src:
+            current = {"shard": 0}
+
+            def dst_for_record(n):
+                if n == 0:
+                    return header
+                if n == 1:
+                    for h in handles:
+                        h.write(header.getvalue())
+                row = n - 1
+                while current["shard"] < len(shards) - 1 and row >= ends[current["shard"]]:
+                    current["shard"] += 1
+                return handles[current["shard"]]
+
+            _iter_records(src, dst_for_record)
+
+        if num_rows == 0:
+            for h in handles:
+                h.write(header.getvalue())
+    finally:
+        for h in handles:
+            h.close()
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "source": os.path.abspath(str(in_csv)),
+        "source_sha256": analysis_mod.file_sha256(in_csv),
+        "num_rows": num_rows,
+        "num_shards": num_shards,
+        "dtypes": dtypes,
+        "shards": shards,
+    }
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return path
+
+
+def load_manifest(manifest_path) -> dict:
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported shard manifest version in {manifest_path}")
+    return manifest
+
+
+def shard_entry(manifest: dict, shard_csv_path) -> dict:
+    """Manifest entry for a shard input file, matched by file name."""
+    name = os.path.basename(str(shard_csv_path))
+    for s in manifest["shards"]:
+        if s["file"] == name:
+            return s
+    raise ValueError(f"{name} is not listed in the shard manifest")
+
+
+def merge_shards(manifest_path, outputs_dir, out_csv, *, usda_caches=(), cache_out=None) -> str:
+    """
+    Reassembles shard outputs (outputs_dir/<shard file name>) in original
+    row order. Records are copied as raw bytes, so the merged file is
+    identical to what a single-node run would have written.
+
+    usda_caches: per-shard cache files to union into cache_out (default:
+    usda_cache.json), keeping the entries it already has.
+    Writes the analysis sidecar for the merged file.
+    """
+    manifest = load_manifest(manifest_path)
+
+    with open(out_csv, "w", newline="", encoding="utf-8") as dst:
+        for s in manifest["shards"]:
+            src_path = os.path.join(outputs_dir, s["file"])
+            if not os.path.exists(src_path):
+                raise FileNotFoundError(f"Missing shard output: {src_path}")
+
+            with open(src_path, newline="", encoding="utf-8") as src:
+                first = s["index"] == 0
+                records = _iter_records(src, lambda n: dst if (n > 0 or first) else None) - 1
+
+            if records != s["rows"]:
+                raise ValueError(f"Shard output {src_path} has {records} rows, manifest expects {s['rows']}")
+
+    if usda_caches:
+        # Imported here so shard runs that only read the manifest skip requests
+        from processing_scripts import usda_integration as usda_mod
+
+        # Existing entries of the target cache (default: usda_cache.json) are kept
+        merged = usda_mod.merge_caches(
+            [usda_mod._load_cache(cache_out), *(usda_mod._load_cache(p) for p in usda_caches)]
+        )
+        usda_mod._save_cache(merged, cache_out)
+
+    merged_df = csv_loader.read_csv(out_csv, analysis_mod.SIDECAR_COLUMNS, dtype=csv_loader.NUMERIC_DTYPES)
+    analysis_mod.write_analysis_sidecar(merged_df, out_csv)
+    return out_csv
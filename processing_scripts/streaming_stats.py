@@ -0,0 +1,492 @@
+# processing_scripts/streaming_stats.py
+
+from __future__ import annotations
+
+import json
+import math
+import random
+from collections import Counter
+
+import pandas as pd
+
+from processing_scripts import csv_loader
+from processing_scripts import data_analysis as analysis_mod
+
+
+DEFAULT_K = 200
+
+
+def _key(item):
+    return item[0]
+
+
+class KLLSketch:
+    """
+    Mergeable quantile sketch (Karnin, Lang, Liberty 2016).
+
+    Items are (value, row_index, recipe_name) tuples, so a quantile query
+    returns an actual row — used for the "median recipe" references.
+
+    Error bounds:
+    - exact while the sketch (or a merge of sketches) holds fewer than k items
+    - otherwise the returned item's rank is within about ±1.7% of the
+      requested rank for k=200 (99% confidence); error shrinks roughly as 1/k
+    - memory is O(k) items regardless of how many values are seen
+    """
+
+    def __init__(self, k: int = DEFAULT_K, c: float = 2.0 / 3.0, seed: int = 0):
+        self.k = k
+        self.c = c
+        self.compactors = [[]]
+        self.size = 0
+        self.n = 0
+        self._rng = random.Random(seed)
+
+    def _capacity(self, h: int) -> int:
+        depth = len(self.compactors) - h - 1
+        return int(math.ceil(self.k * self.c ** depth)) + 1
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def update(self, item) -> None:
+        self.compactors[0].append(item)
+        self.size += 1
+        self.n += 1
+        if self.size >= self._max_size():
+            self._compress()
+
+    def _compress(self) -> None:
+        for h in range(len(self.compactors)):
+            if len(self.compactors[h]) >= self._capacity(h):
+                if h + 1 >= len(self.compactors):
+                    self.compactors.append([])
+                self.compactors[h + 1].extend(self._compact(self.compactors[h]))
+                self.size = sum(len(c) for c in self.compactors)
+                if self.size < self._max_size():
+                    break
+
+    def _compact(self, compactor: list) -> list:
+        compactor.sort(key=_key)
+        keep_last = compactor.pop() if len(compactor) % 2 == 1 else None
+        offset = self._rng.randint(0, 1)
+        promoted = compactor[offset::2]
+        compactor.clear()
+        if keep_last is not None:
+            compactor.append(keep_last)
+        return promoted
+
+    def merge(self, other: "KLLSketch") -> None:
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for h, items in enumerate(other.compactors):
+            self.compactors[h].extend(items)
+        self.n += other.n
+        self.size = sum(len(c) for c in self.compactors)
+        while self.size >= self._max_size():
+            self._compress()
+
+    def _weighted_items(self):
+        weighted = []
+        for h, items in enumerate(self.compactors):
+            w = 1 << h
+            weighted.extend((it, w) for it in items)
+        weighted.sort(key=lambda t: t[0][0])
+        return weighted
+
+    def quantile_item(self, q: float):
+        """Stored item whose (weighted) rank is closest to q * n."""
+        weighted = self._weighted_items()
+        if not weighted:
+            return None
+        total = sum(w for _, w in weighted)
+        target = q * total
+        cum = 0
+        for item, w in weighted:
+            cum += w
+            if cum >= target:
+                return item
+        return weighted[-1][0]
+
+    def cdf(self, value: float) -> float:
+        """Approximate fraction of seen values <= value."""
+        weighted = self._weighted_items()
+        total = sum(w for _, w in weighted)
+        if total == 0:
+            return 0.0
+        return sum(w for it, w in weighted if it[0] <= value) / total
+
+    def quantile(self, q: float):
+        """
+        Approximate q-quantile. While the sketch is still exact this matches
+        pandas' linear interpolation.
+        """
+        if self.n == 0:
+            return None
+        if len(self.compactors) == 1:
+            values = sorted(it[0] for it in self.compactors[0])
+            pos = q * (len(values) - 1)
+            lo = int(math.floor(pos))
+            hi = min(lo + 1, len(values) - 1)
+            return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+        return self.quantile_item(q)[0]
+
+    def to_dict(self) -> dict:
+        return {"k": self.k, "c": self.c, "n": self.n, "compactors": self.compactors}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "KLLSketch":
+        sk = cls(k=d["k"], c=d["c"])
+        sk.compactors = [[tuple(it) for it in items] for items in d["compactors"]]
+        sk.n = d["n"]
+        sk.size = sum(len(c) for c in sk.compactors)
+        return sk
+
+
+class MetricSummary:
+    """
+    count / sum / min / max (with row references) plus a KLL sketch
+    for one numeric column. Mergeable across chunks and shards.
+    """
+
+    def __init__(self, k: int = DEFAULT_K):
+        self.count = 0
+        self.total = 0.0
+        self.min_item = None
+        self.max_item = None
+        self.sketch = KLLSketch(k=k)
+
+    def update(self, value: float, row_index: int, recipe_name) -> None:
+        item = (float(value), int(row_index), recipe_name)
+        self.count += 1
+        self.total += item[0]
+        # Ties keep the earliest row, same as idxmin/idxmax
+        if self.min_item is None or item[0] < self.min_item[0]:
+            self.min_item = item
+        if self.max_item is None or item[0] > self.max_item[0]:
+            self.max_item = item
+        self.sketch.update(item)
+
+    def merge(self, other: "MetricSummary") -> None:
+        if other.count == 0:
+            return
+        self.count += other.count
+        self.total += other.total
+        if self.min_item is None or other.min_item[0] < self.min_item[0] or \
+                (other.min_item[0] == self.min_item[0] and other.min_item[1] < self.min_item[1]):
+            self.min_item = other.min_item
+        if self.max_item is None or other.max_item[0] > self.max_item[0] or \
+                (other.max_item[0] == self.max_item[0] and other.max_item[1] < self.max_item[1]):
+            self.max_item = other.max_item
+        self.sketch.merge(other.sketch)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def median_item(self):
+        """
+        Row reference for the median: the row closest to the estimated
+        median while exact, else the sketch's stored item at rank 0.5.
+        """
+        median = self.sketch.quantile(0.5)
+        if len(self.sketch.compactors) == 1:
+            return min(self.sketch.compactors[0], key=lambda it: (abs(it[0] - median), it[1]))
+        return self.sketch.quantile_item(0.5)
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "min_item": self.min_item,
+            "max_item": self.max_item,
+            "sketch": self.sketch.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "MetricSummary":
+        m = cls()
+        m.count = d["count"]
+        m.total = d["total"]
+        m.min_item = tuple(d["min_item"]) if d["min_item"] is not None else None
+        m.max_item = tuple(d["max_item"]) if d["max_item"] is not None else None
+        m.sketch = KLLSketch.from_dict(d["sketch"])
+        return m
+
+
+def _name(value):
+    return value if isinstance(value, str) else None
+
+
+def _restrictions(value):
+    if not isinstance(value, str) or value.strip() in csv_loader.NA_VALUES:
+        return []
+    return [r.strip() for r in value.split(", ")]
+
+
+class PartitionSummary:
+    """
+    Mergeable summary of one pipeline partition (a chunk, a shard, or a whole file).
+
+    Row indices are global: pass row_offset = number of rows written before
+    this partition so references match the merged output file.
+
+    Reports mirror the dicts returned by processing_scripts.data_analysis.
+    """
+
+    METRICS = ("total_calories_usda", "difficulty_score")
+
+    def __init__(self, k: int = DEFAULT_K):
+        self.k = k
+        self.rows = 0
+        self.has_name = False
+        self.columns = set()
+        self.metrics = {m: MetricSummary(k) for m in self.METRICS}
+        self.difficulty_counts = Counter()
+        self.by_restriction = {}
+
+    def _restriction_metrics(self, restriction: str) -> dict:
+        if restriction not in self.by_restriction:
+            self.by_restriction[restriction] = {m: MetricSummary(self.k) for m in self.METRICS}
+        return self.by_restriction[restriction]
+
+    def update(self, df: pd.DataFrame, row_offset: int | None = None) -> "PartitionSummary":
+        if row_offset is None:
+            row_offset = self.rows
+        self.columns.update(df.columns)
+        self.has_name = self.has_name or "recipe_name" in df.columns
+        # In-memory pipeline frames still hold NA labels ("N/A", "None") as
+        # strings; count them as missing, like reading the output CSV does
+        df = analysis_mod.as_read_back(df, ["recipe_name", "difficulty", "dietary_restrictions", *self.METRICS])
+
+        names = df["recipe_name"].tolist() if "recipe_name" in df.columns else [None] * len(df)
+        restr = df["dietary_restrictions"].tolist() if "dietary_restrictions" in df.columns else [None] * len(df)
+        metric_vals = {
+            m: pd.to_numeric(df[m], errors="coerce").tolist() if m in df.columns else [float("nan")] * len(df)
+            for m in self.METRICS
+        }
+
+        if "difficulty" in df.columns:
+            self.difficulty_counts.update(df["difficulty"].dropna().tolist())
+
+        for i in range(len(df)):
+            row = row_offset + i
+            name = _name(names[i])
+            restrictions = _restrictions(restr[i])
+            for m in self.METRICS:
+                v = metric_vals[m][i]
+                if v is None or v != v:
+                    continue
+                self.metrics[m].update(v, row, name)
+                for r in restrictions:
+                    self._restriction_metrics(r)[m].update(v, row, name)
+
+        # Restrictions with no numeric data still show up in the report
+        for value in restr:
+            for r in _restrictions(value):
+                self._restriction_metrics(r)
+
+        self.rows = max(self.rows, row_offset + len(df))
+        return self
+
+    def merge(self, other: "PartitionSummary") -> "PartitionSummary":
+        self.rows = max(self.rows, other.rows)
+        self.has_name = self.has_name or other.has_name
+        self.columns |= other.columns
+        for m in self.METRICS:
+            self.metrics[m].merge(other.metrics[m])
+        self.difficulty_counts.update(other.difficulty_counts)
+        for r, ms in other.by_restriction.items():
+            mine = self._restriction_metrics(r)
+            for m in self.METRICS:
+                mine[m].merge(ms[m])
+        return self
+
+    def _ref_name(self, item):
+        if not self.has_name:
+            return "N/A"
+        return item[2]
+
+    def calorie_report(self) -> dict:
+        """Same structure as data_analysis.analyze_calories."""
+        if "total_calories_usda" not in self.columns:
+            return {"error": "'total_calories_usda' column not found in the CSV."}
+        m = self.metrics["total_calories_usda"]
+        if m.count == 0:
+            return {"error": "No valid calorie data found in 'total_calories_usda' column."}
+        med = m.median_item()
+        return {
+            "mean_calories": m.mean,
+            "median_calories": m.sketch.quantile(0.5),
+            "25th_percentile_calories": m.sketch.quantile(0.25),
+            "75th_percentile_calories": m.sketch.quantile(0.75),
+            "min_calories": m.min_item[0],
+            "min_calorie_recipe_name": self._ref_name(m.min_item),
+            "min_calorie_row_index": m.min_item[1],
+            "max_calories": m.max_item[0],
+            "max_calorie_recipe_name": self._ref_name(m.max_item),
+            "max_calorie_row_index": m.max_item[1],
+            "median_calorie_recipe_name": self._ref_name(med),
+            "median_calorie_row_index": med[1],
+        }
+
+    def difficulty_report(self) -> dict:
+        """Same structure as data_analysis.analyze_difficulty."""
+        if "difficulty" not in self.columns:
+            return {"error": "'difficulty' column not found in the CSV."}
+        return {"difficulty_counts": dict(self.difficulty_counts.most_common())}
+
+    def difficulty_score_report(self) -> dict:
+        """Same structure as data_analysis.analyze_difficulty_scores."""
+        if "difficulty_score" not in self.columns:
+            return {"error": "'difficulty_score' column not found in the CSV."}
+        m = self.metrics["difficulty_score"]
+        if m.count == 0:
+            return {"error": "No valid difficulty score data found."}
+        med = m.median_item()
+        return {
+            "min_difficulty_score": m.min_item[0],
+            "min_difficulty_recipe_name": self._ref_name(m.min_item),
+            "min_difficulty_row_index": m.min_item[1],
+            "median_difficulty_score": m.sketch.quantile(0.5),
+            "median_difficulty_recipe_name": self._ref_name(med),
+            "median_difficulty_row_index": med[1],
+            "mean_difficulty_score": m.mean,
+            "max_difficulty_score": m.max_item[0],
+            "max_difficulty_recipe_name": self._ref_name(m.max_item),
+            "max_difficulty_row_index": m.max_item[1],
+        }
+
+    def dietary_report(self) -> dict:
+        """Same structure as data_analysis.analyze_by_dietary_restriction."""
+        for col in ("dietary_restrictions", "total_calories_usda", "difficulty_score"):
+            if col not in self.columns:
+                return {"error": f"'{col}' column not found in the CSV."}
+
+        results = {}
+        for restriction in sorted(self.by_restriction):
+            cal = self.by_restriction[restriction]["total_calories_usda"]
+            score = self.by_restriction[restriction]["difficulty_score"]
+
+            if cal.count == 0:
+                calorie_analysis = {"error": "No valid calorie data for this restriction."}
+            else:
+                med = cal.median_item()
+                calorie_analysis = {
+                    "min_calories": cal.min_item[0],
+                    "median_calories": cal.sketch.quantile(0.5),
+                    "mean_calories": cal.mean,
+                    "max_calories": cal.max_item[0],
+                    "min_calorie_recipe_name": self._ref_name(cal.min_item),
+                    "min_calorie_row_index": cal.min_item[1],
+                    "median_calorie_recipe_name": self._ref_name(med),
+                    "median_calorie_row_index": med[1],
+                    "max_calorie_recipe_name": self._ref_name(cal.max_item),
+                    "max_calorie_row_index": cal.max_item[1],
+                }
+
+            if score.count == 0:
+                difficulty_analysis = {"error": "No valid difficulty score data for this restriction."}
+            else:
+                med = score.median_item()
+                difficulty_analysis = {
+                    "min_difficulty_score": score.min_item[0],
+                    "median_difficulty_score": score.sketch.quantile(0.5),
+                    "mean_difficulty_score": score.mean,
+                    "max_difficulty_score": score.max_item[0],
+                    "min_difficulty_recipe_name": self._ref_name(score.min_item),
+                    "min_difficulty_row_index": score.min_item[1],
+                    "median_difficulty_recipe_name": self._ref_name(med),
+                    "median_difficulty_row_index": med[1],
+                    "max_difficulty_recipe_name": self._ref_name(score.max_item),
+                    "max_difficulty_row_index": score.max_item[1],
+                }
+
+            results[restriction] = {
+                "calorie_analysis": calorie_analysis,
+                "difficulty_analysis": difficulty_analysis,
+            }
+        return results
+
+    def reports(self) -> dict:
+        """All four reports, keyed like the streaming_stats / processing.py stats output."""
+        return {
+            "calories": self.calorie_report(),
+            "difficulty": self.difficulty_report(),
+            "difficulty_scores": self.difficulty_score_report(),
+            "by_dietary_restriction": self.dietary_report(),
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "k": self.k,
+            "rows": self.rows,
+            "has_name": self.has_name,
+            "columns": sorted(self.columns),
+            "metrics": {m: s.to_dict() for m, s in self.metrics.items()},
+            "difficulty_counts": dict(self.difficulty_counts),
+            "by_restriction": {
+                r: {m: s.to_dict() for m, s in ms.items()} for r, ms in self.by_restriction.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "PartitionSummary":
+        p = cls(k=d["k"])
+        p.rows = d["rows"]
+        p.has_name = d["has_name"]
+        p.columns = set(d["columns"])
+        p.metrics = {m: MetricSummary.from_dict(s) for m, s in d["metrics"].items()}
+        p.difficulty_counts = Counter(d["difficulty_counts"])
+        p.by_restriction = {
+            r: {m: MetricSummary.from_dict(s) for m, s in ms.items()} for r, ms in d["by_restriction"].items()
+        }
+        return p
+
+    def save(self, path) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path) -> "PartitionSummary":
+        """Raises ValueError if path is not a saved PartitionSummary."""
+        with open(path) as f:
+            try:
+                d = json.load(f)
+            except ValueError as e:
+                raise ValueError(f"{path} is not valid JSON ({e})")
+        if not isinstance(d, dict) or not {"k", "metrics", "by_restriction"} <= d.keys():
+            raise ValueError(f"{path} is not a streaming_stats summary")
+        try:
+            return cls.from_dict(d)
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"{path} is not a valid streaming_stats summary ({e!r})")
+
+
+def merge_summaries(summaries) -> PartitionSummary:
+    merged = None
+    for s in summaries:
+        if merged is None:
+            merged = PartitionSummary(k=s.k)
+        merged.merge(s)
+    return merged if merged is not None else PartitionSummary()
+
+
+def summarize_csv(file_path, *, chunksize: int = 50_000) -> PartitionSummary:
+    """Builds a summary of an output CSV one chunk at a time."""
+    summary = PartitionSummary()
+    columns = ["recipe_name", "difficulty", "dietary_restrictions", *PartitionSummary.METRICS]
+    for chunk in csv_loader.read_csv(file_path, columns, dtype=csv_loader.NUMERIC_DTYPES, chunksize=chunksize):
+        summary.update(chunk)
+    return summary
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python -m processing_scripts.streaming_stats <summary.json> [<summary.json> ...]")
+        sys.exit(1)
+
+    merged = merge_summaries(PartitionSummary.load(p) for p in sys.argv[1:])
+    print(json.dumps(merged.reports(), indent=2, default=str))
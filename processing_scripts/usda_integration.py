@@ -1,8 +1,12 @@
 # processing_scripts/usda_integration.py
 
 import re
+import os
 import ast
 import json
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import pandas as pd
@@ -15,17 +19,94 @@ BASE_URL = "https://api.nal.usda.gov/fdc/v1"
 CACHE_PATH = Path("usda_cache.json")
 
 
-def _load_cache():
-    if CACHE_PATH.exists():
+# Caches held in memory by a long-lived worker (see worker.py), keyed by resolved path.
+# _load_cache hands these out instead of re-reading the file.
+_preloaded_caches = {}
+
+
+def _cache_file(cache_path=None) -> Path:
+    return Path(cache_path) if cache_path is not None else CACHE_PATH
+
+
+def _read_cache_file(path: Path) -> dict:
+    if path.exists():
         try:
-            return json.loads(CACHE_PATH.read_text())
+            return json.loads(path.read_text())
         except Exception:
             return {}
     return {}
 
 
-def _save_cache(cache):
-    CACHE_PATH.write_text(json.dumps(cache, indent=2))
+def _load_cache(cache_path=None):
+    path = _cache_file(cache_path)
+    warm = _preloaded_caches.get(str(path.resolve()))
+    if warm is not None:
+        return warm
+    return _read_cache_file(path)
+
+
+def preload_cache(cache_path=None) -> dict:
+    """Loads a cache file once and keeps it in memory for later _load_cache calls."""
+    path = _cache_file(cache_path)
+    cache = _read_cache_file(path)
+    _preloaded_caches[str(path.resolve())] = cache
+    return cache
+
+
+def preloaded_caches() -> dict:
+    return _preloaded_caches
+
+
+@contextmanager
+def _cache_file_lock(path: Path):
+    # Serializes read-merge-write between processes sharing a cache file
+    try:
+        import fcntl
+    except ImportError:  # no flock (Windows): best effort
+        yield
+        return
+    with open(str(path) + ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _save_cache(cache, cache_path=None):
+    """
+    Writes cache merged with what the file holds now, so entries other
+    processes (e.g. several workers on one job directory) saved since it
+    was loaded are kept. Entries only found on disk are added to cache too.
+    """
+    path = _cache_file(cache_path)
+    with _cache_file_lock(path):
+        merged = merge_caches([cache, _read_cache_file(path)])
+        for key, val in merged.items():
+            if key not in cache:
+                cache[key] = val
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(merged, indent=2))
+        os.replace(tmp, path)
+
+
+def _save_cache_if_changed(cache, loaded_size: int, cache_path=None):
+    # Entries are only ever added, so an unchanged size means nothing to write
+    if len(cache) != loaded_size or not _cache_file(cache_path).exists():
+        _save_cache(cache, cache_path)
+
+
+def merge_caches(caches):
+    """
+    Union of several cache dicts. A real calorie value wins over None,
+    since None may just be a failed request on one node.
+    """
+    merged = {}
+    for cache in caches:
+        for key, val in cache.items():
+            if merged.get(key) is None:
+                merged[key] = val
+    return merged
 
 
 def clean_ingredient(raw: str) -> str:
@@ -151,13 +232,20 @@ def compute_total_calories_for_row(ingredients_value, cache: dict, max_ingredien
     return total
 
 
-def add_usda_calories(df: pd.DataFrame, ingredients_col: str = "ingredients", max_rows: int | None = None) -> pd.DataFrame:
+def add_usda_calories(
+    df: pd.DataFrame,
+    ingredients_col: str = "ingredients",
+    max_rows: int | None = None,
+    cache_path=None,
+    max_ingredients: int = 3,
+) -> pd.DataFrame:
     if ingredients_col not in df.columns:
         print(f"⚠ ingredients column '{ingredients_col}' not found, skipping USDA calories")
         df["total_calories_usda"] = None
         return df
 
-    cache = _load_cache()
+    cache = _load_cache(cache_path)
+    loaded_size = len(cache)
     df = df.copy()
 
     total_rows = len(df)
@@ -172,9 +260,124 @@ def add_usda_calories(df: pd.DataFrame, ingredients_col: str = "ingredients", ma
         if i % 100 == 0:
             print(f"USDA calories: processing row {i}/{limit}")
 
-        total = compute_total_calories_for_row(val, cache)
+        total = compute_total_calories_for_row(val, cache, max_ingredients=max_ingredients)
         calories.append(total)
 
     df["total_calories_usda"] = calories
-    _save_cache(cache)
+    _save_cache_if_changed(cache, loaded_size, cache_path)
     return df
+
+
+class USDAPrefetcher:
+    """
+    Resolves USDA calories in background threads so network I/O overlaps
+    with the CPU stages of the pipeline.
+
+        prefetch = USDAPrefetcher(df, max_rows=2000).start()
+        ...CPU stages on df...
+        df = prefetch.apply(df)
+
+    Rows are split into batches; each batch is resolved by one worker and
+    joined in order by apply(). An ingredient already being looked up by
+    another worker is waited on, not requested twice. Results (and the
+    saved cache) match add_usda_calories.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        ingredients_col: str = "ingredients",
+        max_rows: int | None = None,
+        max_ingredients: int = 3,
+        cache_path=None,
+        workers: int = 4,
+        batch_size: int = 100,
+    ):
+        self.ingredients_col = ingredients_col
+        self.max_ingredients = max_ingredients
+        self.cache_path = cache_path
+        self.workers = workers
+        self.batch_size = batch_size
+
+        self.missing = ingredients_col not in df.columns
+        values = [] if self.missing else df[ingredients_col].tolist()
+        self.num_rows = len(df)
+        self.limit = min(max_rows if max_rows is not None else len(values), len(values))
+        self._values = values[:self.limit]
+
+        self.cache = {}
+        self._loaded_size = 0
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._pool = None
+        self._batches = []
+
+    def start(self) -> "USDAPrefetcher":
+        if self.missing:
+            return self
+        self.cache = _load_cache(self.cache_path)
+        self._loaded_size = len(self.cache)
+        self._pool = ThreadPoolExecutor(max_workers=max(self.workers, 1), thread_name_prefix="usda")
+        for start in range(0, self.limit, self.batch_size):
+            end = min(start + self.batch_size, self.limit)
+            self._batches.append((start, self._pool.submit(self._resolve_batch, start, end)))
+        return self
+
+    def _lookup(self, cleaned: str):
+        with self._lock:
+            if cleaned in self.cache:
+                return self.cache[cleaned]
+            event = self._pending.get(cleaned)
+            owner = event is None
+            if owner:
+                event = self._pending[cleaned] = threading.Event()
+
+        if not owner:
+            event.wait()
+            # The owner may have failed; then this worker retries the lookup
+            return self._lookup(cleaned)
+
+        try:
+            kcal = usda_search(cleaned)
+            with self._lock:
+                self.cache[cleaned] = kcal
+            return kcal
+        finally:
+            with self._lock:
+                del self._pending[cleaned]
+            event.set()
+
+    def _resolve_batch(self, start: int, end: int) -> list:
+        totals = []
+        for val in self._values[start:end]:
+            total = 0.0
+            for raw in parse_ingredients_field(val)[:self.max_ingredients]:
+                kcal = self._lookup(clean_ingredient(raw))
+                if kcal:
+                    total += float(kcal)
+            totals.append(total)
+        return totals
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Joins the background results onto df (same rows, same order)."""
+        if self.missing:
+            print(f"⚠ ingredients column '{self.ingredients_col}' not found, skipping USDA calories")
+            df["total_calories_usda"] = None
+            return df
+
+        if len(df) != self.num_rows:
+            raise ValueError("USDAPrefetcher.apply needs the same rows it was started with")
+
+        calories = []
+        try:
+            for start, future in self._batches:
+                print(f"USDA calories: processing row {start}/{self.limit}")
+                calories.extend(future.result())
+        finally:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+        calories.extend([None] * (len(df) - len(calories)))
+        df = df.copy()
+        df["total_calories_usda"] = calories
+        _save_cache_if_changed(self.cache, self._loaded_size, self.cache_path)
+        return df
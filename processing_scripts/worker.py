@@ -0,0 +1,273 @@
+# processing_scripts/worker.py
+
+from __future__ import annotations
+
+import argparse
+import glob
+import io
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+
+# Pipeline modules (pandas, requests, ...) are imported inside the functions
+# below: once by the long-lived server in warm_up(), never by the light
+# `submit` client.
+
+
+DEFAULT_SOCKET = "processing_worker.sock"
+POLL_INTERVAL = 0.2
+
+
+def warm_up(cache_paths=(), warm_csvs=()) -> None:
+    """
+    Imports every stage module, loads USDA caches into memory and warms
+    the memoized cuisine -> course classification (category.cuisine_bucket)
+    with the cuisines of warm_csvs, so forked jobs start with all of it.
+    """
+    import processing
+    from processing_scripts import csv_loader
+    from processing_scripts import category as categories_mod
+    from processing_scripts import usda_integration as usda_mod
+
+    processing.import_stage_modules()
+    usda_mod.preload_cache(None)
+    for p in cache_paths:
+        usda_mod.preload_cache(p)
+
+    # re caches the compiled patterns used by clean_ingredient and friends
+    usda_mod.clean_ingredient("1 cup (8 oz) chopped walnuts, 2 tbsp. butter")
+    usda_mod.parse_ingredients_field("[{'name': 'salt'}]")
+
+    for p in warm_csvs:
+        processing.add_course_from_cuisine_path(csv_loader.read_csv(p, lambda c: "cuisine" in c.lower()))
+    known = categories_mod.cuisine_bucket.cache_info().currsize
+    print(f"✅ {known} cuisine categories classified in advance")
+
+
+def _cache_sizes() -> dict:
+    from processing_scripts import usda_integration as usda_mod
+
+    return {p: len(c) for p, c in usda_mod.preloaded_caches().items()}
+
+
+def _cache_delta(sizes_at_fork: dict) -> dict:
+    """New entries per preloaded cache (entries are only ever appended)."""
+    from processing_scripts import usda_integration as usda_mod
+
+    delta = {}
+    for p, cache in usda_mod.preloaded_caches().items():
+        start = sizes_at_fork.get(p, 0)
+        if len(cache) > start:
+            delta[p] = dict(list(cache.items())[start:])
+    return delta
+
+
+def _run_in_child(argv, cwd) -> int:
+    import processing
+
+    if cwd:
+        os.chdir(cwd)
+    sys.argv = ["processing.py"] + list(argv)
+    try:
+        processing.main()
+        return 0
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception:
+        traceback.print_exc()
+        return 1
+
+
+def run_job(argv, cwd=None) -> dict:
+    """
+    Runs one processing.py job in a forked child (isolation: a crash or
+    leak in the job cannot affect the worker). The child inherits the warm
+    state; new USDA cache entries it finds are sent back to the parent.
+    """
+    started = time.time()
+
+    if not hasattr(os, "fork"):
+        # No fork (Windows): run in-process, without isolation
+        out = io.StringIO()
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout = sys.stderr = out
+        cwd_before = os.getcwd()
+        try:
+            code = _run_in_child(argv, cwd)
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+            os.chdir(cwd_before)
+        return {"returncode": code, "output": out.getvalue(), "elapsed": time.time() - started}
+
+    sizes = _cache_sizes()
+    out_r, out_w = os.pipe()
+    res_r, res_w = os.pipe()
+    pid = os.fork()
+
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        os.close(out_r)
+        os.close(res_r)
+        os.dup2(out_w, 1)
+        os.dup2(out_w, 2)
+        sys.stdout = os.fdopen(1, "w", buffering=1, closefd=False)
+        sys.stderr = os.fdopen(2, "w", buffering=1, closefd=False)
+        code = 1
+        try:
+            code = _run_in_child(argv, cwd)
+            with os.fdopen(res_w, "w") as res:
+                json.dump(_cache_delta(sizes), res)
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+    os.close(out_w)
+    os.close(res_w)
+    # Drain both pipes at once so a chatty job cannot block on a full pipe
+    captured = {}
+
+    def read_result():
+        with os.fdopen(res_r, "r") as f:
+            captured["result"] = f.read()
+
+    reader = threading.Thread(target=read_result)
+    reader.start()
+    with os.fdopen(out_r, "r", errors="replace") as f:
+        output = f.read()
+    reader.join()
+    result = captured.get("result", "")
+    _, status = os.waitpid(pid, 0)
+    code = os.waitstatus_to_exitcode(status)
+
+    if code == 0 and result:
+        from processing_scripts import usda_integration as usda_mod
+
+        for p, entries in json.loads(result).items():
+            usda_mod.preloaded_caches().setdefault(p, {}).update(entries)
+
+    return {"returncode": code, "output": output, "elapsed": time.time() - started}
+
+
+def _handle_request(raw: bytes) -> dict:
+    try:
+        req = json.loads(raw.decode("utf-8"))
+        argv = req["argv"]
+    except (ValueError, KeyError, TypeError):
+        return {"returncode": 2, "output": "invalid request: expected {\"argv\": [...]}", "elapsed": 0.0}
+    return run_job(argv, req.get("cwd"))
+
+
+def serve_socket(socket_path: str = DEFAULT_SOCKET) -> None:
+    """
+    Accepts one JSON request per connection on a Unix socket:
+        {"argv": ["in.csv", "out.csv", ...], "cwd": "/path"}
+    and replies with {"returncode", "output", "elapsed"}. Jobs run one at a time.
+    """
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen()
+    print(f"✅ worker listening on {socket_path}")
+
+    try:
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                raw = conn.makefile("rb").readline()
+                conn.sendall((json.dumps(_handle_request(raw)) + "\n").encode("utf-8"))
+    finally:
+        server.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def serve_job_dir(job_dir: str) -> None:
+    """
+    Polls job_dir for *.job.json files ({"argv": [...], "cwd": ...}).
+    Each job is claimed by renaming it to *.running, and its result is
+    written to *.result.json; the job file ends up as *.done.
+    """
+    os.makedirs(job_dir, exist_ok=True)
+    print(f"✅ worker watching {job_dir}")
+
+    while True:
+        jobs = sorted(glob.glob(os.path.join(job_dir, "*.job.json")))
+        if not jobs:
+            time.sleep(POLL_INTERVAL)
+            continue
+        for job in jobs:
+            base = job[: -len(".job.json")]
+            running = base + ".running"
+            try:
+                os.rename(job, running)
+            except OSError:
+                continue  # claimed by another worker
+            with open(running, "rb") as f:
+                result = _handle_request(f.read())
+            with open(base + ".result.json.tmp", "w") as f:
+                json.dump(result, f)
+            os.rename(base + ".result.json.tmp", base + ".result.json")
+            os.rename(running, base + ".done")
+
+
+def submit(argv, socket_path: str = DEFAULT_SOCKET, cwd=None) -> dict:
+    """Sends a job to a running socket worker and waits for the result."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(socket_path)
+        req = {"argv": list(argv), "cwd": cwd or os.getcwd()}
+        s.sendall((json.dumps(req) + "\n").encode("utf-8"))
+        return json.loads(s.makefile("rb").readline().decode("utf-8"))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m processing_scripts.worker",
+        description="Long-lived processing worker that keeps caches warm across jobs.",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_serve = sub.add_parser("serve", help="run the worker")
+    p_serve.add_argument("--socket", default=None, help=f"Unix socket path (default: {DEFAULT_SOCKET})")
+    p_serve.add_argument("--job-dir", default=None, help="watch a directory for *.job.json files instead")
+    p_serve.add_argument("--usda-cache", action="append", default=[], help="extra USDA cache files to keep warm")
+    p_serve.add_argument(
+        "--warm-csv",
+        action="append",
+        default=[],
+        help="input CSVs whose cuisine categories are classified up front (repeatable)",
+    )
+
+    p_submit = sub.add_parser("submit", help="send a job to a running socket worker")
+    p_submit.add_argument("--socket", default=DEFAULT_SOCKET)
+    p_submit.add_argument("job_argv", nargs=argparse.REMAINDER, help="processing.py arguments")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "submit":
+        job_argv = args.job_argv[1:] if args.job_argv[:1] == ["--"] else args.job_argv
+        result = submit(job_argv, args.socket)
+        sys.stdout.write(result["output"])
+        print(f"(job finished in {result['elapsed'] * 1000:.0f} ms, exit {result['returncode']})")
+        return result["returncode"]
+
+    warm_up(args.usda_cache, args.warm_csv)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        if args.job_dir:
+            serve_job_dir(args.job_dir)
+        else:
+            serve_socket(args.socket or DEFAULT_SOCKET)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())